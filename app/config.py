@@ -0,0 +1,10 @@
+import os
+
+# Resource budgets of a rerun, see utils/memory_governor.py
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get('MOIRE_SESSION_MEMORY_MB', 512))
+GLOBAL_MEMORY_BUDGET_MB = float(os.environ.get('MOIRE_GLOBAL_MEMORY_MB', 2048))
+SESSION_TIME_BUDGET_S = float(os.environ.get('MOIRE_SESSION_TIME_S', 2.0))
+
+# Shared compute pool, see utils/compute_scheduler.py
+FFT_WORKERS = int(os.environ.get('MOIRE_FFT_WORKERS', 1))
+COMPUTE_WORKERS = int(os.environ.get('MOIRE_COMPUTE_WORKERS', max(1, (os.cpu_count() or 1) // FFT_WORKERS)))
@@ -8,7 +8,11 @@ from utils.input_controls import get_input_controls
 from utils.pattern_utils import create_pattern
 from utils.vector_utils import create_frequency_vectors, create_all_vectors
 from utils.fourier_utils import compute_fourier_transform, compute_inverse_fourier
+from utils.memory_governor import governed_rerun
+from utils.compute_scheduler import run_task
+from utils.vector_export import write_svg, write_pdf
 import numpy as np
+import io
 
 def main():
     st.set_page_config(layout="wide", menu_items={'Get help': None, 'Report a bug': None, 'About': None})
@@ -41,50 +45,68 @@ def main():
      visibility_radius, window_half_size, view_mode, 
      intensity_threshold, n_harmonics) = get_input_controls()
 
-    # Generate pattern and computations
-    pattern_size = 700
-    combined_pattern = np.ones((pattern_size, pattern_size))
-    
-    # Create individual patterns and combine them
-    for pattern_type, freq, angle, thickness, circle_position in zip(
-        pattern_types, frequencies, angles, thicknesses, circle_positions):
-        combined_pattern *= create_pattern(
-            pattern_size, freq, angle, thickness, pattern_type, circle_position)
-    
-    fourier_spectrum,abs_fourier_spectrum = compute_fourier_transform(combined_pattern, window_half_size,visibility_radius)
-    inverse_fourier = compute_inverse_fourier(fourier_spectrum)
-    
-     
-    base_vectors = create_frequency_vectors(pattern_type, frequencies, angles,thicknesses)
-    all_vectors = create_all_vectors(base_vectors, n_harmonics,intensity_threshold)
+    base_vectors = create_frequency_vectors(pattern_types, frequencies, angles,thicknesses)
+
+    # Generate pattern and computations, within the memory and time budgets
+    with governed_rerun(700, len(pattern_types), base_vectors, n_harmonics,
+                        intensity_threshold, window_half_size) as plan:
+        if plan['degradations']:
+            st.info("Quality lowered to stay within the server budget: " + "; ".join(plan['degradations']))
+
+        pattern_size = plan['pattern_size']
+        combined_pattern = np.ones((pattern_size, pattern_size), dtype=plan['fft_dtype'])
+        
+        # Create individual patterns and combine them
+        for pattern_type, freq, angle, thickness, circle_position in zip(
+            pattern_types, frequencies, angles, thicknesses, circle_positions):
+            combined_pattern *= run_task(create_pattern,
+                pattern_size, freq, angle, thickness, pattern_type, circle_position)
+        
+        fourier_spectrum,abs_fourier_spectrum = run_task(compute_fourier_transform, combined_pattern, window_half_size,visibility_radius)
+        inverse_fourier = run_task(compute_inverse_fourier, fourier_spectrum)
+        
+        all_vectors = run_task(create_all_vectors, base_vectors, plan['n_harmonics'],intensity_threshold)
     
-    # Display visualizations based on selected mode
-    left_col, right_col = st.columns(2)
+        # Display visualizations based on selected mode, still within the reservation
+        # since the figures account for part of the estimated peak
+        left_col, right_col = st.columns(2)
     
-    if view_mode == "Pattern & Frequency":
-        with left_col:
-            st.markdown("##### Pattern")
-            pattern_fig = create_pattern_figure(combined_pattern)
-            st.plotly_chart(pattern_fig, use_container_width=True, config={'displayModeBar': True, 'scrollZoom': True})
+        if view_mode == "Pattern & Frequency":
+            with left_col:
+                st.markdown("##### Pattern")
+                pattern_fig = create_pattern_figure(combined_pattern)
+                st.plotly_chart(pattern_fig, use_container_width=True, config={'displayModeBar': True, 'scrollZoom': True})
             
-        with right_col:
-            st.markdown("##### Frequency Domain")
-            freq_fig = create_frequency_vector_figure(all_vectors, base_vectors, visibility_radius, window_half_size)
-            st.plotly_chart(freq_fig, use_container_width=True)
-    else:  # Fourier Analysis mode
-        with left_col:
-            st.markdown("##### Inverse Fourier Transform")
-            inverse_fig = create_pattern_figure(inverse_fourier)
-            st.plotly_chart(inverse_fig, use_container_width=True)
+            with right_col:
+                st.markdown("##### Frequency Domain")
+                freq_fig = create_frequency_vector_figure(all_vectors, base_vectors, visibility_radius, window_half_size)
+                st.plotly_chart(freq_fig, use_container_width=True)
+        else:  # Fourier Analysis mode
+            with left_col:
+                st.markdown("##### Inverse Fourier Transform")
+                inverse_fig = create_pattern_figure(inverse_fourier)
+                st.plotly_chart(inverse_fig, use_container_width=True)
             
-        with right_col:
-            st.markdown("##### Fourier Transform")
-            fourier_fig = create_spectrum_figure(abs_fourier_spectrum, window_half_size,visibility_radius)
-            st.plotly_chart(fourier_fig, use_container_width=True)
+            with right_col:
+                st.markdown("##### Fourier Transform")
+                fourier_fig = create_spectrum_figure(abs_fourier_spectrum, window_half_size,visibility_radius)
+                st.plotly_chart(fourier_fig, use_container_width=True)
 
     st.write("")  # Add some space
     st.write("")
 
+    # Vector export of the layers for printing overlays
+    with st.expander("Export for Printing"):
+        width_mm = st.number_input("Print width (mm)", 10.0, 5000.0, 200.0, 10.0)
+        if st.button("Prepare SVG / PDF"):
+            layers = (pattern_types, frequencies, angles, thicknesses, circle_positions)
+            svg_file, pdf_file = io.BytesIO(), io.BytesIO()
+            write_svg(svg_file, *layers, width_mm=width_mm)
+            write_pdf(pdf_file, *layers, width_mm=width_mm, one_page_per_layer=True)
+            st.download_button("Download SVG", svg_file.getvalue(), "moire_pattern.svg", "image/svg+xml")
+            st.download_button("Download PDF (one page per layer)", pdf_file.getvalue(),
+                               "moire_pattern.pdf", "application/pdf")
+
     # Explanation section below the visualizations
     with st.expander("How to Use This App", icon="🚨"):
         st.markdown("""
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from scipy import fft
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import config
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+class ComputeScheduler:
+    """
+    Bounded worker pool shared by all the sessions of the server.
+
+    Tasks are queued per priority and per session. Workers always serve the
+    interactive queue before the background one, and within a priority take
+    one task per session in turn, so a session submitting many tasks cannot
+    starve the others. Each task runs with scipy.fft limited to fft_workers
+    threads, so at most max_workers * fft_workers threads compute at once.
+    """
+
+    def __init__(self, max_workers: int, fft_workers: int = 1):
+        self.max_workers = max_workers
+        self.fft_workers = fft_workers
+        self._queues = {INTERACTIVE: OrderedDict(), BACKGROUND: OrderedDict()}
+        self._changed = threading.Condition()
+        self._local = threading.local()
+        self._workers = []
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_depth = 0
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"compute-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn: Callable, *args, session_id: Optional[str] = None,
+               priority: int = INTERACTIVE, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) and return its future.
+
+        Tasks submitted from a worker run inline, since waiting on them from
+        a worker could deadlock the pool.
+        """
+        future = Future()
+        if getattr(self._local, 'is_worker', False):
+            self._run(future, fn, args, kwargs)
+            return future
+
+        with self._changed:
+            self._start_workers()
+            sessions = self._queues[priority]
+            sessions.setdefault(session_id, deque()).append((future, fn, args, kwargs, time.monotonic()))
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._depth())
+            self._changed.notify()
+        return future
+
+    def run(self, fn: Callable, *args, session_id: Optional[str] = None,
+            priority: int = INTERACTIVE, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and wait for its result."""
+        return self.submit(fn, *args, session_id=session_id, priority=priority, **kwargs).result()
+
+    def _depth(self) -> int:
+        return sum(len(tasks) for sessions in self._queues.values() for tasks in sessions.values())
+
+    def _next_task(self):
+        """Pop the next task: highest priority first, then round-robin over the sessions."""
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if sessions:
+                session_id, tasks = next(iter(sessions.items()))
+                task = tasks.popleft()
+                if tasks:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                return task
+        return None
+
+    def _run(self, future: Future, fn: Callable, args: tuple, kwargs: dict):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with fft.set_workers(self.fft_workers):
+                future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _work(self):
+        self._local.is_worker = True
+        while True:
+            with self._changed:
+                task = self._next_task()
+                while task is None:
+                    self._changed.wait()
+                    task = self._next_task()
+                future, fn, args, kwargs, queued_at = task
+                self._running += 1
+                self._total_wait += time.monotonic() - queued_at
+
+            self._run(future, fn, args, kwargs)
+
+            with self._changed:
+                self._running -= 1
+                self._completed += 1
+
+    def metrics(self) -> Dict:
+        """Queue depths and counters of the scheduler."""
+        with self._changed:
+            started = self._completed + self._running
+            return {
+                'workers': self.max_workers,
+                'fft_workers': self.fft_workers,
+                'running': self._running,
+                'queue_depth': self._depth(),
+                'max_queue_depth': self._max_depth,
+                'queue_depth_by_priority': {
+                    'interactive': sum(len(tasks) for tasks in self._queues[INTERACTIVE].values()),
+                    'background': sum(len(tasks) for tasks in self._queues[BACKGROUND].values())
+                },
+                'queued_sessions': len(set(self._queues[INTERACTIVE]) | set(self._queues[BACKGROUND])),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'mean_wait_seconds': self._total_wait / started if started else 0.0
+            }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> ComputeScheduler:
+    """Process-wide scheduler, sized from config."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ComputeScheduler(config.COMPUTE_WORKERS, config.FFT_WORKERS)
+        return _scheduler
+
+def current_session_id() -> Optional[str]:
+    """Id of the Streamlit session running the current script, if any."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def run_task(fn: Callable, *args, priority: int = INTERACTIVE, **kwargs):
+    """Run a heavy computation on the shared scheduler on behalf of the current session."""
+    return get_scheduler().run(fn, *args, session_id=current_session_id(), priority=priority, **kwargs)
+
+def submit_task(fn: Callable, *args, priority: int = BACKGROUND, **kwargs) -> Future:
+    """Queue a computation (prefetch by default) on behalf of the current session."""
+    return get_scheduler().submit(fn, *args, session_id=current_session_id(), priority=priority, **kwargs)
@@ -0,0 +1,255 @@
+import numpy as np
+from typing import List, Tuple, Dict, Optional
+from itertools import product, permutations
+from scipy.optimize import minimize
+from utils.vector_utils import create_frequency_vectors, calculate_fourier_coefficient, line_fourier_coefficients
+
+# Slider ranges from input_controls.get_input_controls
+FREQUENCY_BOUNDS = (10.0, 100.0)
+ANGLE_BOUNDS = (0.0, 360.0)
+THICKNESS_BOUNDS = (0.1, 0.9)
+
+def moire_combinations(n_layers: int, n_harmonics: int) -> np.ndarray:
+    """
+    Enumerate the harmonic combinations that produce a moiré component.
+
+    Only combinations mixing at least two layers are kept, and of each pair
+    (n, -n) only the one whose first non-zero harmonic is positive, since both
+    describe the same fringes.
+
+    Args:
+        n_layers: Number of line grids
+        n_harmonics: Highest harmonic order per layer
+
+    Returns:
+        np.ndarray: Integer array of shape (combinations, layers)
+    """
+    combinations = []
+    for combination in product(range(-n_harmonics, n_harmonics + 1), repeat=n_layers):
+        non_zero = [h for h in combination if h != 0]
+        if len(non_zero) >= 2 and non_zero[0] > 0:
+            combinations.append(combination)
+    return np.array(combinations, dtype=int).reshape(-1, n_layers)
+
+# Tolerances under which two refined designs are considered the same
+DUPLICATE_TOLERANCES = (0.5, 0.5, 0.02)  # frequency, angle (degrees), thickness
+# Ratio of the base frequencies to the moiré frequency giving a contrast factor of 1/2
+FREQUENCY_RATIO_SCALE = 3.0
+
+def batched_intensity(combinations: np.ndarray, thicknesses: np.ndarray) -> np.ndarray:
+    """
+    Absolute intensity of every harmonic combination: the product of the layer coefficients.
+
+    Not normalized by the DC component, which would favour nearly opaque
+    grids whose moiré is the faintest.
+
+    Args:
+        combinations: Harmonics, shape (C, L)
+        thicknesses: Layer thicknesses, shape (B, L)
+
+    Returns:
+        np.ndarray: Intensities, shape (B, C)
+    """
+    coefficients = line_fourier_coefficients(combinations[None, :, :], thicknesses[:, None, :])
+    return np.prod(coefficients, axis=-1)
+
+def frequency_contrast(frequencies: np.ndarray, combinations: np.ndarray,
+                       target_frequency: float) -> np.ndarray:
+    """
+    Factor favouring base grids much finer than the moiré they produce.
+
+    A moiré is only striking when its period is large compared to the lines
+    making it (red dots near the center, blue dots far away). The factor
+    ratio / (ratio + FREQUENCY_RATIO_SCALE) grows from 0 to 1 without
+    saturating, ratio being the lowest base frequency used by a combination
+    over the target frequency.
+
+    Args:
+        frequencies: Layer frequencies, shape (B, L)
+        combinations: Harmonics, shape (C, L)
+        target_frequency: Moiré frequency
+
+    Returns:
+        np.ndarray: Factors, shape (B, C)
+    """
+    used = np.where(combinations[None, :, :] != 0, frequencies[:, None, :], np.inf)
+    ratio = used.min(axis=-1) / target_frequency
+    return ratio / (ratio + FREQUENCY_RATIO_SCALE)
+
+def evaluate_designs(frequencies: np.ndarray, angles: np.ndarray, thicknesses: np.ndarray,
+                     combinations: np.ndarray, target_frequency: float, target_angle: float,
+                     frequency_tolerance: float, angle_tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a batch of line grid configurations against a target moiré.
+
+    The score of a combination is its intensity weighted by a gaussian
+    penalty on the relative frequency error and the orientation error, and by
+    the frequency_contrast of its base grids; the score of a configuration is
+    the one of its best combination.
+
+    Args:
+        frequencies, angles, thicknesses: Layer parameters, shape (B, L), angles in degrees
+        combinations: Harmonic combinations, shape (C, L)
+        target_frequency: Moiré frequency, in the same units as the layer frequencies
+        target_angle: Orientation of the moiré frequency vector in degrees (modulo 180)
+        frequency_tolerance: Relative frequency error giving a penalty of exp(-1/2)
+        angle_tolerance: Orientation error in degrees giving a penalty of exp(-1/2)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Best score and best combination index, shape (B,)
+    """
+    theta = np.radians(angles)
+    # Moiré vectors of every combination, shape (B, C)
+    kx = (frequencies * np.cos(theta)) @ combinations.T
+    ky = (frequencies * np.sin(theta)) @ combinations.T
+
+    frequency_error = (np.hypot(kx, ky) - target_frequency) / (target_frequency * frequency_tolerance)
+    angle_error = (np.degrees(np.arctan2(ky, kx)) - target_angle + 90) % 180 - 90
+    angle_error /= angle_tolerance
+
+    scores = batched_intensity(combinations, thicknesses)
+    scores *= np.exp(-0.5 * (frequency_error**2 + angle_error**2))
+    scores *= frequency_contrast(frequencies, combinations, target_frequency)
+
+    best = np.argmax(scores, axis=1)
+    return scores[np.arange(len(best)), best], best
+
+def optimize_moire_design(target_period: float, target_angle: float, n_layers: int = 2,
+                          n_harmonics: int = 2, pattern_size: int = 700,
+                          frequency_bounds: Tuple[float, float] = FREQUENCY_BOUNDS,
+                          angle_bounds: Tuple[float, float] = ANGLE_BOUNDS,
+                          thickness_bounds: Tuple[float, float] = THICKNESS_BOUNDS,
+                          period_tolerance: float = 0.05, angle_tolerance: float = 2.0,
+                          n_samples: int = 1_000_000, batch_size: int = 100_000,
+                          n_results: int = 5, seed: Optional[int] = None) -> List[Dict]:
+    """
+    Search line grid parameters giving the strongest moiré of a given period and orientation.
+
+    Strongest means a bright moiré made of base grids much finer than it, see
+    evaluate_designs.
+
+    Random configurations are scored in vectorized batches, then the best ones
+    are refined with L-BFGS-B on their best harmonic combination. Refined
+    designs that are copies of a better one (same layers in another order,
+    or mirrored about the target orientation) are dropped.
+
+    Args:
+        target_period: Moiré period in pixels of a pattern of size pattern_size
+        target_angle: Orientation of the moiré frequency vector in degrees
+        n_layers: Number of line grids (Grid A, B, ...)
+        n_harmonics: Highest harmonic order considered per layer
+        pattern_size: Pattern size in pixels, as in main()
+        frequency_bounds, angle_bounds, thickness_bounds: Search ranges, equal bounds fix a parameter
+        period_tolerance: Relative period error considered acceptable
+        angle_tolerance: Orientation error in degrees considered acceptable
+        n_samples: Number of random configurations evaluated
+        batch_size: Number of configurations evaluated per vectorized batch
+        n_results: Number of designs returned
+        seed: Seed of the random sampler
+
+    Returns:
+        List[Dict]: Designs ranked by decreasing score
+    """
+    if not 1 <= n_layers <= 4:
+        raise ValueError("n_layers must be between 1 and 4 (Grid A to Grid D)")
+
+    rng = np.random.default_rng(seed)
+    combinations = moire_combinations(n_layers, n_harmonics)
+    if len(combinations) == 0:
+        return []
+
+    target_frequency = pattern_size / target_period
+    tolerances = (period_tolerance, angle_tolerance)
+    bounds = [frequency_bounds] * n_layers + [angle_bounds] * n_layers + [thickness_bounds] * n_layers
+    lower, upper = np.array(bounds, dtype=float).T
+
+    # Keep the n_refine best samples across batches
+    n_refine = 4 * n_results
+    best_params = np.empty((0, 3 * n_layers))
+    best_scores = np.empty(0)
+    for start in range(0, n_samples, batch_size):
+        size = min(batch_size, n_samples - start)
+        params = rng.uniform(lower, upper, size=(size, 3 * n_layers))
+        scores, _ = evaluate_designs(*np.split(params, 3, axis=1), combinations,
+                                     target_frequency, target_angle, *tolerances)
+        keep = np.argsort(scores)[-n_refine:]
+        best_params = np.concatenate([best_params, params[keep]])
+        best_scores = np.concatenate([best_scores, scores[keep]])
+        keep = np.argsort(best_scores)[-n_refine:]
+        best_params, best_scores = best_params[keep], best_scores[keep]
+
+    designs = []
+    kept_keys = []
+    for params in best_params[::-1]:
+        _, (combination_index,) = evaluate_designs(*np.split(params[None], 3, axis=1), combinations,
+                                                   target_frequency, target_angle, *tolerances)
+        combination = combinations[combination_index:combination_index + 1]
+
+        def objective(x):
+            score, _ = evaluate_designs(*np.split(x[None], 3, axis=1), combination,
+                                        target_frequency, target_angle, *tolerances)
+            return -score[0]
+
+        result = minimize(objective, params, method='L-BFGS-B', bounds=bounds)
+        frequencies, angles, thicknesses = np.split(result.x, 3)
+
+        keys = [design_key(frequencies, angles, thicknesses),
+                design_key(frequencies, 2 * target_angle - angles, thicknesses)]
+        if any(is_same_design(key, kept) for key in keys for kept in kept_keys):
+            continue
+        kept_keys.append(keys[0])
+
+        designs.append(describe_design(frequencies, angles, thicknesses, combination[0],
+                                       -result.fun, pattern_size))
+
+    designs.sort(key=lambda design: design['score'], reverse=True)
+    return designs[:n_results]
+
+def design_key(frequencies: np.ndarray, angles: np.ndarray, thicknesses: np.ndarray) -> np.ndarray:
+    """
+    Canonical form of a line grid design, shape (L, 3).
+
+    A grid at angle a + 180 is the same grid, so angles are taken modulo 180.
+    """
+    return np.stack([frequencies, np.mod(angles, 180), thicknesses], axis=1)
+
+def is_same_design(key: np.ndarray, other: np.ndarray) -> bool:
+    """Whether two design keys match within DUPLICATE_TOLERANCES, whatever the layer order."""
+    for order in permutations(range(len(key))):
+        difference = np.abs(key[list(order)] - other)
+        difference[:, 1] = np.minimum(difference[:, 1], 180 - difference[:, 1])
+        if np.all(difference <= np.array(DUPLICATE_TOLERANCES)):
+            return True
+    return False
+
+def describe_design(frequencies: np.ndarray, angles: np.ndarray, thicknesses: np.ndarray,
+                    combination: np.ndarray, score: float, pattern_size: int = 700) -> Dict:
+    """
+    Build the result dictionary of a line grid design.
+
+    The 'pattern_params' entry has the layout of st.session_state.pattern_params,
+    the layers being mapped to Grid A, B, ... (pattern indices 0, 1, ...).
+    """
+    base_vectors = create_frequency_vectors('Grid', list(frequencies), list(angles), list(thicknesses))
+    moire_vector = sum(harmonic * base_vector['vector']
+                       for harmonic, base_vector in zip(combination, base_vectors))
+
+    intensity = 1.0
+    for harmonic, thickness in zip(combination, thicknesses):
+        intensity *= calculate_fourier_coefficient(int(harmonic), thickness)
+    moire_frequency = np.linalg.norm(moire_vector)
+
+    return {
+        'pattern_params': {
+            'frequency': {i: float(f) for i, f in enumerate(frequencies)},
+            'angle': {i: float(a) % 360 for i, a in enumerate(angles)},
+            'thickness': {i: float(t) for i, t in enumerate(thicknesses)},
+        },
+        'coordinates': [int(h) for h in combination],
+        'moire_vector': moire_vector,
+        'moire_period': float(pattern_size / moire_frequency),
+        'moire_angle': float(np.degrees(np.arctan2(moire_vector[1], moire_vector[0])) % 180),
+        'intensity': float(intensity),
+        'frequency_ratio': float(min(f for f, h in zip(frequencies, combination) if h != 0) / moire_frequency),
+        'score': float(score)
+    }
@@ -6,7 +6,7 @@ def apply_2d_hanning(pattern):
     rows, cols = pattern.shape
     hanning_1d_rows = np.hanning(rows)
     hanning_1d_cols = np.hanning(cols)
-    hanning_2d = np.outer(hanning_1d_rows, hanning_1d_cols)
+    hanning_2d = np.outer(hanning_1d_rows, hanning_1d_cols).astype(pattern.dtype, copy=False)
     return pattern * hanning_2d
 
 def compute_fourier_transform(pattern: np.ndarray, window_half_size: float = 100.0 , visibility_radius: float = 50.0 ) -> np.ndarray:
@@ -14,7 +14,7 @@ def compute_fourier_transform(pattern: np.ndarray, window_half_size: float = 100
     Compute the 2D Fourier transform of the pattern.
     
     Args:
-        pattern: Input pattern array
+        pattern: Input pattern array, a float32 pattern gives a complex64 transform
         window_half_size: Half size of the frequency window for proper scaling
     """
     # Apply Hanning window to reduce edge effects
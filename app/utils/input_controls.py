@@ -11,6 +11,9 @@ def initialize_state():
             'R': {i: 0.0 for i in range(10)},
             'theta': {i: 0.0 for i in range(10)}
         }
+    if 'show_0' not in st.session_state:
+        # Grid A is shown by default
+        st.session_state.show_0 = True
 
 def handle_value_change(param_type, pattern_idx):
     """Callback function to handle slider value changes"""
@@ -18,6 +21,20 @@ def handle_value_change(param_type, pattern_idx):
     if key in st.session_state:
         st.session_state.pattern_params[param_type][pattern_idx] = st.session_state[key]
 
+def load_pattern_params(pattern_params):
+    """Load a parameter set (e.g. an optimizer design) into the session state.
+
+    Must run before the sliders are drawn, for instance from a button callback.
+    The slider states are dropped so the sliders start again from pattern_params,
+    and the loaded patterns are switched on.
+    """
+    initialize_state()
+    for param_type, values in pattern_params.items():
+        for pattern_idx, value in values.items():
+            st.session_state.pattern_params[param_type][pattern_idx] = value
+            st.session_state.pop(f"{param_type}_{pattern_idx}", None)
+            st.session_state[f"show_{pattern_idx}"] = True
+
 def get_input_controls():
     initialize_state()
     
@@ -33,29 +50,29 @@ def get_input_controls():
         
         with pattern_col1:
             st.write("Regular Grids")
-            if st.checkbox("Grid A", value=True):
+            if st.checkbox("Grid A", key="show_0"):
                 active_patterns.append(("Line Grid A", "Grid", 0))
-            if st.checkbox("Grid B"):
+            if st.checkbox("Grid B", key="show_1"):
                 active_patterns.append(("Line Grid B", "Grid", 1))
-            if st.checkbox("Grid C"):
+            if st.checkbox("Grid C", key="show_2"):
                 active_patterns.append(("Line Grid C", "Grid", 2))
-            if st.checkbox("Grid D"):
+            if st.checkbox("Grid D", key="show_3"):
                 active_patterns.append(("Line Grid D", "Grid", 3))
         
         with pattern_col2:
             st.write("Circle Patterns")
-            if st.checkbox("Circle A"):
+            if st.checkbox("Circle A", key="show_4"):
                 active_patterns.append(("Circle A", "Circle", 4))
-            if st.checkbox("Circle B"):
+            if st.checkbox("Circle B", key="show_5"):
                 active_patterns.append(("Circle B", "Circle", 5))
         
         with pattern_col3:
             st.write("Dot Patterns")
-            if st.checkbox("Dot Grid A"):
+            if st.checkbox("Dot Grid A", key="show_6"):
                 active_patterns.append(("Dot Grid A", "Dot", 6))
-            if st.checkbox("Dot Grid B"):
+            if st.checkbox("Dot Grid B", key="show_7"):
                 active_patterns.append(("Dot Grid B", "Dot", 7))
-            if st.checkbox("Inverted Dot A"):
+            if st.checkbox("Inverted Dot A", key="show_8"):
                 active_patterns.append(("Inverted Dot A", "InvertedDot", 8))
     
     with col2:
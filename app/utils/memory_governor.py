@@ -0,0 +1,175 @@
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+import config
+from utils.vector_utils import vector_count_bound
+
+# Cost model, measured on the functions of main() (bytes and seconds), see cost-model-check.py
+PATTERN_BYTES_PER_PIXEL = 42      # create_pattern temporaries (meshgrid, rotated grids)
+FIGURE_BYTES_PER_PIXEL = 16       # heatmap serialization
+FFT_BYTES_PER_PIXEL = {'float64': 82, 'float32': 54}  # compute_fourier_transform + inverse
+VECTOR_BYTES = 650                # one create_all_vectors dict, without its coordinates
+COORDINATE_BYTES = 8              # one harmonic in the coordinates of a vector
+PARTIAL_BYTES = 24                # one partial combination of create_all_vectors (ratio, parent, entry)
+FIGURE_BYTES_PER_VECTOR = 200     # point, label and hover text of a vector in the figure
+PATTERN_SECONDS_PER_PIXEL = 80e-9
+FIGURE_SECONDS_PER_PIXEL = 60e-9
+FFT_SECONDS_PER_PIXEL_LOG = {'float64': 6e-9, 'float32': 3e-9}
+VECTOR_SECONDS = 40e-6            # mostly the frequency figure
+
+RESOLUTION_STEP = 0.8
+MIN_RESOLUTION = 256
+
+# Memory reserved by the reruns in progress, shared by all sessions of the server
+_reserved_bytes = 0
+_reserved_changed = threading.Condition()
+
+def estimate_rerun(pattern_size: int, n_layers: int, vector_count: int, fft_dtype: str = 'float64',
+                   partial_count: int = 0, n_columns: int = 0) -> Dict:
+    """
+    Estimate the peak memory and the duration of a rerun of main().
+
+    Args:
+        pattern_size: Pattern size in pixels
+        n_layers: Number of active patterns
+        vector_count: Number of vectors from create_all_vectors (or a bound)
+        fft_dtype: 'float64' or 'float32', precision of the pattern and its transform
+        partial_count: Partial combinations held by create_all_vectors, from vector_count_bound
+        n_columns: Number of base vectors, the length of the vector coordinates
+
+    Returns:
+        Dict: 'peak_bytes' and 'seconds'
+    """
+    pixels = pattern_size**2
+    pixel_bytes = np.dtype(fft_dtype).itemsize
+    # The combined pattern lives through rendering and transforms, the stage temporaries do not
+    stage_bytes = max(PATTERN_BYTES_PER_PIXEL, FFT_BYTES_PER_PIXEL[fft_dtype])
+    # The vectors live through the figure; the partial combinations and the
+    # gathered coordinates are freed before the figure is built
+    vector_bytes = vector_count * (VECTOR_BYTES + COORDINATE_BYTES * n_columns)
+    expansion_bytes = partial_count * PARTIAL_BYTES + vector_count * 2 * COORDINATE_BYTES * n_columns
+    figure_bytes = vector_count * FIGURE_BYTES_PER_VECTOR
+    peak_bytes = (pixels * (pixel_bytes + stage_bytes + FIGURE_BYTES_PER_PIXEL)
+                  + vector_bytes + max(expansion_bytes, figure_bytes))
+
+    seconds = (pixels * (n_layers * PATTERN_SECONDS_PER_PIXEL + FIGURE_SECONDS_PER_PIXEL)
+               + pixels * np.log2(pixels) * FFT_SECONDS_PER_PIXEL_LOG[fft_dtype]
+               + vector_count * VECTOR_SECONDS)
+    return {'peak_bytes': int(peak_bytes), 'seconds': float(seconds)}
+
+def plan_rerun(pattern_size: int, n_layers: int, base_vectors: List[Dict], n_harmonics: int,
+               intensity_threshold: float, window_half_size: float,
+               memory_budget: float, time_budget: float) -> Dict:
+    """
+    Choose the rerun settings fitting the budgets, degrading quality step by step.
+
+    FFT precision is lowered first, then the harmonics when the vectors dominate
+    the cost, then the resolution (never below what the frequency window needs),
+    and finally the harmonics down to 1.
+
+    Args:
+        pattern_size: Requested pattern size in pixels
+        n_layers: Number of active patterns
+        base_vectors: Output of create_frequency_vectors
+        n_harmonics, intensity_threshold: Requested create_all_vectors arguments
+        window_half_size: Frequency window, the FFT must be at least twice as wide
+        memory_budget: Bytes available to the rerun
+        time_budget: Seconds available to the rerun
+
+    Returns:
+        Dict: 'pattern_size', 'n_harmonics', 'fft_dtype', the estimate and
+        'degradations', the messages describing what was lowered
+    """
+    min_size = min(pattern_size, max(MIN_RESOLUTION, 2 * int(np.ceil(window_half_size)) + 2))
+    size, harmonics, dtype = pattern_size, n_harmonics, 'float64'
+    counts = {}
+
+    def estimate():
+        if harmonics not in counts:
+            counts[harmonics] = vector_count_bound(base_vectors, harmonics, intensity_threshold)
+        vector_count, partial_count = counts[harmonics]
+        return vector_count, estimate_rerun(size, n_layers, vector_count, dtype,
+                                            partial_count, len(base_vectors))
+
+    vector_count, cost = estimate()
+    while cost['peak_bytes'] > memory_budget or cost['seconds'] > time_budget:
+        vector_bytes = vector_count * (VECTOR_BYTES + FIGURE_BYTES_PER_VECTOR)
+        if dtype == 'float64':
+            dtype = 'float32'
+        elif harmonics > 1 and vector_bytes > cost['peak_bytes'] / 2:
+            harmonics -= 1
+        elif size > min_size:
+            size = max(min_size, int(size * RESOLUTION_STEP))
+        elif harmonics > 1:
+            harmonics -= 1
+        else:
+            break
+        vector_count, cost = estimate()
+
+    degradations = []
+    if dtype != 'float64':
+        degradations.append(f"FFT precision reduced to {dtype}")
+    if harmonics != n_harmonics:
+        degradations.append(f"Harmonics reduced from {n_harmonics} to {harmonics}")
+    if size != pattern_size:
+        degradations.append(f"Resolution reduced from {pattern_size} to {size} px")
+    if cost['peak_bytes'] > memory_budget or cost['seconds'] > time_budget:
+        degradations.append("Estimated cost still over budget at the lowest quality")
+
+    return {
+        'pattern_size': size,
+        'n_harmonics': harmonics,
+        'fft_dtype': dtype,
+        'peak_bytes': cost['peak_bytes'],
+        'seconds': cost['seconds'],
+        'degradations': degradations
+    }
+
+@contextmanager
+def governed_rerun(pattern_size: int, n_layers: int, base_vectors: List[Dict], n_harmonics: int,
+                   intensity_threshold: float, window_half_size: float,
+                   session_budget_mb: Optional[float] = None, global_budget_mb: Optional[float] = None,
+                   time_budget: Optional[float] = None, wait_timeout: float = 5.0):
+    """
+    Plan a rerun within the session budget and the memory left on the server, and reserve it.
+
+    When even the most degraded settings do not fit in the memory left by the
+    other sessions, waits up to wait_timeout seconds for reruns to finish, then
+    runs anyway. The reservation is released when the block exits.
+
+    Yields:
+        Dict: The plan from plan_rerun
+    """
+    global _reserved_bytes
+    session_budget = (session_budget_mb or config.SESSION_MEMORY_BUDGET_MB) * 2**20
+    global_budget = (global_budget_mb or config.GLOBAL_MEMORY_BUDGET_MB) * 2**20
+    time_budget = time_budget or config.SESSION_TIME_BUDGET_S
+    deadline = time.monotonic() + wait_timeout
+
+    while True:
+        with _reserved_changed:
+            reserved = _reserved_bytes
+        # Planning runs the vector count, outside the lock so sessions plan in parallel
+        budget = min(session_budget, global_budget - reserved)
+        plan = plan_rerun(pattern_size, n_layers, base_vectors, n_harmonics, intensity_threshold,
+                          window_half_size, budget, time_budget)
+        with _reserved_changed:
+            remaining = deadline - time.monotonic()
+            fits = plan['peak_bytes'] <= global_budget - _reserved_bytes
+            # Waiting only helps when the other sessions are the reason it does not fit
+            if fits or remaining <= 0 or plan['peak_bytes'] > min(session_budget, global_budget):
+                if not fits:
+                    plan['degradations'].append("Server busy: running over the memory budget")
+                _reserved_bytes += plan['peak_bytes']
+                break
+            if _reserved_bytes == reserved:
+                _reserved_changed.wait(remaining)
+
+    try:
+        yield plan
+    finally:
+        with _reserved_changed:
+            _reserved_bytes -= plan['peak_bytes']
+            _reserved_changed.notify_all()
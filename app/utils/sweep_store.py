@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import io
+import numpy as np
+from typing import List, Dict, Optional, Union
+
+MANIFEST_SUFFIX = '.json'
+
+def _json_default(value):
+    """Convert the numpy values found in pattern parameters to JSON types."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot store parameter of type {type(value).__name__}")
+
+def _normalize(value):
+    """Parameter value as read back from JSON: tuples become lists, numpy values Python ones."""
+    if isinstance(value, (tuple, list)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (np.generic, np.ndarray)):
+        return _json_default(value)
+    return value
+
+def _atomic_write(path: str, data: bytes):
+    """Write a file under a temporary name and rename it, so readers never see partial files."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class SweepWriter:
+    """
+    Append-only writer of a sweep store.
+
+    A store is a directory of chunks. Each chunk holds up to chunk_size rows of
+    every array in one .npy file per array, plus a JSON manifest with the
+    parameters of its rows. The manifest is written last, so a chunk only
+    becomes visible to readers once complete. Chunk names are unique per
+    writer, which lets any number of processes append to the same store
+    without locking.
+
+    Every row of an array must have the shape and dtype of the rows already
+    in the store. Boolean arrays (rendered patterns) are bit-packed along
+    their last axis.
+    With codec='zlib' the chunk files are also deflated; such chunks are
+    decompressed when read instead of being memory-mapped.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 64, codec: Optional[str] = None):
+        if codec not in (None, 'zlib'):
+            raise ValueError(f"Unknown codec: {codec}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self._params = []
+        self._arrays = {}
+        self._layouts = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _stored_layout(self, name: str) -> Optional[tuple]:
+        """(shape, dtype) of an array in the chunks already in the store, if any."""
+        for file_name in sorted(os.listdir(self.path)):
+            if not file_name.endswith(MANIFEST_SUFFIX):
+                continue
+            with open(os.path.join(self.path, file_name), 'r', encoding='utf-8') as f:
+                info = json.load(f)['arrays'].get(name)
+            if info is not None:
+                return tuple(info['shape']), info['dtype']
+        return None
+
+    def append(self, params: Dict, **arrays: np.ndarray):
+        """
+        Buffer one row and write a chunk when the buffer is full.
+
+        Args:
+            params: Parameters of the row, e.g. those passed to create_pattern
+            arrays: Named arrays of the row, e.g. pattern=..., spectrum=...
+        """
+        if self._params and set(arrays) != set(self._arrays):
+            raise ValueError(f"Expected arrays {sorted(self._arrays)}, got {sorted(arrays)}")
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        for name, array in arrays.items():
+            if name not in self._layouts:
+                self._layouts[name] = self._stored_layout(name) or (array.shape, str(array.dtype))
+            shape, dtype = self._layouts[name]
+            if array.shape != shape or str(array.dtype) != dtype:
+                raise ValueError(f"Array '{name}' has shape {array.shape} and dtype {array.dtype}, "
+                                 f"the store holds shape {shape} and dtype {dtype}")
+        self._params.append(params)
+        for name, array in arrays.items():
+            self._arrays.setdefault(name, []).append(array)
+        if len(self._params) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a new chunk."""
+        if not self._params:
+            return
+        chunk_id = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        manifest = {'rows': len(self._params), 'params': self._params, 'arrays': {}}
+
+        for name, rows in self._arrays.items():
+            data = np.stack(rows)
+            encoding = 'raw'
+            if data.dtype == bool and data.ndim > 1:
+                data = np.packbits(data, axis=-1)
+                encoding = 'packbits'
+
+            buffer = io.BytesIO()
+            np.save(buffer, data)
+            payload = buffer.getvalue()
+            if self.codec == 'zlib':
+                payload = zlib.compress(payload)
+
+            _atomic_write(os.path.join(self.path, f"{chunk_id}.{name}.npy"), payload)
+            manifest['arrays'][name] = {
+                'dtype': str(rows[0].dtype),
+                'shape': list(rows[0].shape),
+                'encoding': encoding,
+                'codec': self.codec
+            }
+
+        _atomic_write(os.path.join(self.path, chunk_id + MANIFEST_SUFFIX),
+                      json.dumps(manifest, default=_json_default).encode('utf-8'))
+        self._params = []
+        self._arrays = {}
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SweepReader:
+    """
+    Read-only view of a sweep store.
+
+    Rows are ordered by the time the reader found their chunk, and keep their
+    position when more chunks are found, so row indices stay valid across
+    refresh(). Uncompressed chunks are memory-mapped, so reading a slice only
+    touches the chunks it spans.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._chunks = []
+        self._offsets = np.zeros(1, dtype=int)
+        self._cache = {}
+        self.params = []
+        self.refresh()
+
+    def refresh(self):
+        """Load the manifests of the chunks written since the last refresh, after the known ones."""
+        known = {chunk['id'] for chunk in self._chunks}
+        names = sorted(name for name in os.listdir(self.path) if name.endswith(MANIFEST_SUFFIX))
+        for name in names:
+            chunk_id = name[:-len(MANIFEST_SUFFIX)]
+            if chunk_id in known:
+                continue
+            with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            manifest['id'] = chunk_id
+            # Chunks of concurrent writers may be committed out of order: a
+            # late chunk goes after the rows already seen rather than among them
+            self._chunks.append(manifest)
+            self.params.extend(manifest['params'])
+        self._offsets = np.cumsum([0] + [chunk['rows'] for chunk in self._chunks])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def where(self, **conditions) -> np.ndarray:
+        """
+        Rows whose parameters match all conditions.
+
+        A condition is either a value compared for equality or a callable
+        returning True for accepted values, e.g. frequency=lambda f: f > 40.
+        Values are compared as stored in JSON, so circle_position=(0, 0)
+        matches the stored [0, 0].
+        """
+        conditions = {key: condition if callable(condition) else _normalize(condition)
+                      for key, condition in conditions.items()}
+        def matches(params):
+            for key, condition in conditions.items():
+                if key not in params:
+                    return False
+                value = params[key]
+                if not (condition(value) if callable(condition) else value == condition):
+                    return False
+            return True
+        return np.array([i for i, params in enumerate(self.params) if matches(params)], dtype=int)
+
+    def _load_chunk(self, chunk_index: int, name: str) -> np.ndarray:
+        chunk = self._chunks[chunk_index]
+        if name not in chunk['arrays']:
+            raise KeyError(f"Array '{name}' missing from chunk {chunk['id']}")
+        file_path = os.path.join(self.path, f"{chunk['id']}.{name}.npy")
+        if chunk['arrays'][name]['codec'] == 'zlib':
+            # Compressed chunks are not kept, to bound the reader memory
+            with open(file_path, 'rb') as f:
+                return np.load(io.BytesIO(zlib.decompress(f.read())))
+        key = (chunk['id'], name)
+        if key not in self._cache:
+            self._cache[key] = np.load(file_path, mmap_mode='r')
+        return self._cache[key]
+
+    def read(self, name: str, rows: Union[int, slice, List[int], np.ndarray] = slice(None)) -> np.ndarray:
+        """
+        Read some rows of an array.
+
+        Args:
+            name: Array name given to SweepWriter.append
+            rows: Row index, slice or index array (as for numpy indexing)
+
+        Returns:
+            np.ndarray: The rows, without the row axis for an integer index
+        """
+        if isinstance(rows, (list, tuple)):
+            rows = np.asarray(rows, dtype=int)
+        indices = np.arange(len(self))[rows]
+        single = np.ndim(indices) == 0
+        indices = np.atleast_1d(indices)
+
+        infos = [chunk['arrays'][name] for chunk in self._chunks if name in chunk['arrays']]
+        if not infos:
+            raise KeyError(f"Array '{name}' not in the store")
+        info = infos[0]
+        if len(indices) == 0:
+            return np.empty((0,) + tuple(info['shape']), dtype=info['dtype'])
+
+        chunk_indices = np.searchsorted(self._offsets, indices, side='right') - 1
+        result = np.empty((len(indices),) + tuple(info['shape']), dtype=info['dtype'])
+
+        for chunk_index in np.unique(chunk_indices):
+            selected = chunk_indices == chunk_index
+            chunk_info = self._chunks[chunk_index]['arrays'][name]
+            if chunk_info['shape'] != info['shape'] or chunk_info['dtype'] != info['dtype']:
+                raise ValueError(f"Array '{name}' of chunk {self._chunks[chunk_index]['id']} has shape "
+                                 f"{chunk_info['shape']} and dtype {chunk_info['dtype']}, "
+                                 f"expected {info['shape']} and {info['dtype']}")
+            local = indices[selected] - self._offsets[chunk_index]
+            data = self._load_chunk(chunk_index, name)[local]
+            if chunk_info['encoding'] == 'packbits':
+                data = np.unpackbits(data, axis=-1, count=info['shape'][-1]).astype(bool)
+            result[selected] = data
+
+        return result[0] if single else result
+
+def open_sweep(path: str) -> SweepReader:
+    """Open a sweep store for reading."""
+    return SweepReader(path)
@@ -0,0 +1,212 @@
+import numpy as np
+from typing import List, Tuple, Iterator, BinaryIO
+
+MM_TO_PT = 72 / 25.4
+BEZIER_CIRCLE = 0.5522847498  # control point distance of a quarter circle
+
+def _clip_polygon(points: List[Tuple[float, float]], a: float, b: float, c: float) -> List[Tuple[float, float]]:
+    """Clip a convex polygon to the half-plane a*x + b*y <= c (Sutherland-Hodgman)."""
+    clipped = []
+    for i, (x1, y1) in enumerate(points):
+        x2, y2 = points[(i + 1) % len(points)]
+        d1 = a * x1 + b * y1 - c
+        d2 = a * x2 + b * y2 - c
+        if d1 <= 0:
+            clipped.append((x1, y1))
+        if d1 * d2 < 0:
+            t = d1 / (d1 - d2)
+            clipped.append((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+    return clipped
+
+def _bands(half_size: float, direction: Tuple[float, float], period: float,
+           start: float, stop: float) -> Iterator[Tuple[float, float]]:
+    """Intervals [k*period + start, k*period + stop] of the projection on direction meeting the frame."""
+    extent = half_size * (abs(direction[0]) + abs(direction[1]))
+    for k in range(int(np.floor(-extent / period)) - 1, int(np.ceil(extent / period)) + 1):
+        low, high = k * period + start, k * period + stop
+        if high > -extent and low < extent:
+            yield low, high
+
+def pattern_primitives(size: int, frequency: float, angle: float, thickness: float,
+                       pattern_type: str, circle_position: tuple = (0, 0)) -> Iterator[Tuple]:
+    """
+    Geometry of the opaque parts of a layer, with the arguments of create_pattern.
+
+    The opaque parts are where create_pattern is False: lines of width
+    thickness * period, the grid between the holes of a Dot lattice, the dots
+    of an InvertedDot lattice and the rings of a Circle pattern. They are
+    clipped to the square [-size/2, size/2]^2, y pointing up.
+
+    Yields:
+        ('polygon', [(x, y), ...]) or ('annulus', cx, cy, inner_radius, outer_radius)
+    """
+    half = size / 2
+    frame = [(-half, -half), (half, -half), (half, half), (-half, half)]
+    period = size / frequency
+    clear = period * (1 - thickness)
+
+    if 'Circle' in pattern_type:
+        cx, cy = circle_position
+        max_radius = max(np.hypot(x - cx, y - cy) for x, y in frame)
+        min_radius = max(0.0, abs(cx) - half, abs(cy) - half)
+        for k in range(int(np.ceil(max_radius / period))):
+            inner, outer = k * period + clear, (k + 1) * period
+            if outer > min_radius:
+                yield ('annulus', cx, cy, inner, outer)
+        return
+
+    theta = np.radians(angle)
+    u = (np.cos(theta), np.sin(theta))    # X_rot direction
+    v = (-np.sin(theta), np.cos(theta))   # Y_rot direction
+
+    def band(direction, low, high, polygon):
+        polygon = _clip_polygon(polygon, direction[0], direction[1], high)
+        return _clip_polygon(polygon, -direction[0], -direction[1], -low)
+
+    if 'Dot' in pattern_type and 'Inverted' in pattern_type:
+        for u_low, u_high in _bands(half, u, period, 0, clear):
+            strip = band(u, u_low, u_high, frame)
+            if len(strip) < 3:
+                continue
+            for v_low, v_high in _bands(half, v, period, 0, clear):
+                dot = band(v, v_low, v_high, strip)
+                if len(dot) >= 3:
+                    yield ('polygon', dot)
+    else:
+        directions = [u, v] if 'Dot' in pattern_type else [u]
+        for direction in directions:
+            for low, high in _bands(half, direction, period, clear, period):
+                strip = band(direction, low, high, frame)
+                if len(strip) >= 3:
+                    yield ('polygon', strip)
+
+def _layers(pattern_types, frequencies, angles, thicknesses, circle_positions):
+    return list(zip(pattern_types, frequencies, angles, thicknesses, circle_positions))
+
+def write_svg(f: BinaryIO, pattern_types: List[str], frequencies: List[float], angles: List[float],
+              thicknesses: List[float], circle_positions: List[tuple],
+              size: int = 700, width_mm: float = 200.0):
+    """
+    Stream the layers as an SVG document, one group per layer.
+
+    The drawing is in pattern units scaled by the viewBox, so the file size
+    only depends on the number of primitives, not on width_mm.
+    """
+    half = size / 2
+    f.write((f'<svg xmlns="http://www.w3.org/2000/svg" width="{width_mm}mm" height="{width_mm}mm" '
+             f'viewBox="{-half} {-half} {size} {size}">\n'
+             f'<defs><clipPath id="frame"><rect x="{-half}" y="{-half}" width="{size}" height="{size}"/>'
+             f'</clipPath></defs>\n').encode('utf-8'))
+
+    for i, (pattern_type, frequency, angle, thickness, circle_position) in enumerate(
+            _layers(pattern_types, frequencies, angles, thicknesses, circle_positions)):
+        # y points up in the pattern, down in SVG
+        f.write(f'<g id="layer-{i}-{pattern_type}" clip-path="url(#frame)" fill="black">\n'
+                f'<g transform="scale(1,-1)">\n'.encode('utf-8'))
+        for primitive in pattern_primitives(size, frequency, angle, thickness, pattern_type, circle_position):
+            if primitive[0] == 'polygon':
+                points = ' '.join(f"{x:.3f},{y:.3f}" for x, y in primitive[1])
+                f.write(f'<polygon points="{points}"/>\n'.encode('utf-8'))
+            else:
+                _, cx, cy, inner, outer = primitive
+                f.write(f'<circle cx="{cx:.3f}" cy="{cy:.3f}" r="{(inner + outer) / 2:.3f}" fill="none" '
+                        f'stroke="black" stroke-width="{outer - inner:.3f}"/>\n'.encode('utf-8'))
+        f.write(b'</g>\n</g>\n')
+    f.write(b'</svg>\n')
+
+def _pdf_layer_content(layer: tuple, size: int) -> Iterator[bytes]:
+    """PDF path operators of one layer, in pattern units."""
+    half = size / 2
+    pattern_type, frequency, angle, thickness, circle_position = layer
+    yield f"{-half:.3f} {-half:.3f} {size} {size} re W n\n".encode('ascii')
+    for primitive in pattern_primitives(size, frequency, angle, thickness, pattern_type, circle_position):
+        if primitive[0] == 'polygon':
+            points = primitive[1]
+            path = [f"{points[0][0]:.3f} {points[0][1]:.3f} m"]
+            path += [f"{x:.3f} {y:.3f} l" for x, y in points[1:]]
+            yield (' '.join(path) + " h f\n").encode('ascii')
+        else:
+            _, cx, cy, inner, outer = primitive
+            r = (inner + outer) / 2
+            k = BEZIER_CIRCLE * r
+            yield (f"{outer - inner:.3f} w {cx + r:.3f} {cy:.3f} m "
+                   f"{cx + r:.3f} {cy + k:.3f} {cx + k:.3f} {cy + r:.3f} {cx:.3f} {cy + r:.3f} c "
+                   f"{cx - k:.3f} {cy + r:.3f} {cx - r:.3f} {cy + k:.3f} {cx - r:.3f} {cy:.3f} c "
+                   f"{cx - r:.3f} {cy - k:.3f} {cx - k:.3f} {cy - r:.3f} {cx:.3f} {cy - r:.3f} c "
+                   f"{cx + k:.3f} {cy - r:.3f} {cx + r:.3f} {cy - k:.3f} {cx + r:.3f} {cy:.3f} c S\n").encode('ascii')
+
+def write_pdf(f: BinaryIO, pattern_types: List[str], frequencies: List[float], angles: List[float],
+              thicknesses: List[float], circle_positions: List[tuple],
+              size: int = 700, width_mm: float = 200.0, one_page_per_layer: bool = False):
+    """
+    Stream the layers as a PDF document, on one page or one page per layer.
+
+    Content streams are written as the primitives are generated, their
+    lengths being stored in objects written after them.
+    """
+    layers = _layers(pattern_types, frequencies, angles, thicknesses, circle_positions)
+    pages = [[layer] for layer in layers] if one_page_per_layer else [layers]
+    width_pt = width_mm * MM_TO_PT
+    scale = width_pt / size
+
+    offsets = {}
+    written = 0
+
+    def write(data: bytes):
+        nonlocal written
+        f.write(data)
+        written += len(data)
+
+    def start_object(number: int):
+        offsets[number] = written
+        write(f"{number} 0 obj\n".encode('ascii'))
+
+    # Objects: 1 catalog, 2 page tree, then page, content and content length for each page
+    page_numbers = [3 + 3 * i for i in range(len(pages))]
+    write(b"%PDF-1.4\n")
+    start_object(1)
+    write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+    start_object(2)
+    kids = ' '.join(f"{number} 0 R" for number in page_numbers)
+    write(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>\nendobj\n".encode('ascii'))
+
+    for number, page_layers in zip(page_numbers, pages):
+        start_object(number)
+        write(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.3f} {width_pt:.3f}] "
+              f"/Contents {number + 1} 0 R >>\nendobj\n".encode('ascii'))
+        start_object(number + 1)
+        write(f"<< /Length {number + 2} 0 R >>\nstream\n".encode('ascii'))
+        stream_start = written
+        # Pattern units to points, origin at the page center, y up as in the pattern
+        write(f"q {scale:.6f} 0 0 {scale:.6f} {width_pt / 2:.3f} {width_pt / 2:.3f} cm 0 g 0 G\n".encode('ascii'))
+        for layer in page_layers:
+            write(b"q\n")
+            for data in _pdf_layer_content(layer, size):
+                write(data)
+            write(b"Q\n")
+        write(b"Q\n")
+        stream_length = written - stream_start
+        write(b"endstream\nendobj\n")
+        start_object(number + 2)
+        write(f"{stream_length}\nendobj\n".encode('ascii'))
+
+    xref_offset = written
+    count = max(offsets) + 1
+    write(f"xref\n0 {count}\n0000000000 65535 f \n".encode('ascii'))
+    for number in range(1, count):
+        write(f"{offsets[number]:010d} 00000 n \n".encode('ascii'))
+    write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+
+def export_pattern(path: str, pattern_types: List[str], frequencies: List[float], angles: List[float],
+                   thicknesses: List[float], circle_positions: List[tuple],
+                   size: int = 700, width_mm: float = 200.0, one_page_per_layer: bool = False):
+    """Export the layers to an .svg or .pdf file, chosen from the extension."""
+    extension = path.lower().rsplit('.', 1)[-1]
+    if extension not in ('svg', 'pdf'):
+        raise ValueError(f"Unsupported export format: {path}")
+    with open(path, 'wb') as f:
+        if extension == 'svg':
+            write_svg(f, pattern_types, frequencies, angles, thicknesses, circle_positions, size, width_mm)
+        else:
+            write_pdf(f, pattern_types, frequencies, angles, thicknesses, circle_positions,
+                      size, width_mm, one_page_per_layer)
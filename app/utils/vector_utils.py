@@ -1,27 +1,67 @@
 import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
-from typing import List, Tuple, Dict
-from itertools import product
+from typing import List, Tuple, Dict, Union, Iterator
+from functools import lru_cache
 
-def calculate_fourier_coefficient(harmonic: int, thickness: float) -> float:
+def line_fourier_coefficients(harmonics: np.ndarray, thickness: np.ndarray) -> np.ndarray:
     """
-    Calculate the Fourier coefficient magnitude for a given harmonic and pattern type.
-    
+    Fourier coefficient magnitudes of a line grid, broadcast over harmonics and thicknesses.
+
+    |sin(n*pi*tau)/(n*pi)| is written as |tau * sinc(n*tau)| so that n = 0 gives
+    the DC component tau without a special case.
+
     Args:
-        harmonic: The harmonic number
-        thickness: The thickness parameter (between 0 and 1)
-        pattern_type: 'grid' or 'dot'
-    
+        harmonics: Harmonic numbers
+        thickness: Thickness parameters (between 0 and 1)
+
     Returns:
-        float: The magnitude of the Fourier coefficient
+        np.ndarray: The magnitudes of the Fourier coefficients
     """
-    tau_T = 1-thickness
-    if harmonic == 0:
-        return tau_T  # DC component
-    
-    # For non-zero harmonics
-    return np.abs((1.0 / (np.pi * harmonic)) * np.sin(harmonic * np.pi * tau_T))
+    tau_T = 1 - np.asarray(thickness, dtype=float)
+    return np.abs(tau_T * np.sinc(np.asarray(harmonics) * tau_T))
+
+@lru_cache(maxsize=1024)
+def _layer_fourier_coefficients(n_harmonics: int, thickness: float, pattern_type: str) -> np.ndarray:
+    """
+    Coefficient table of a single layer, memoized per thickness.
+
+    Line grids (and circles) give a vector indexed by the harmonic, dot lattices
+    a (harmonic x harmonic) matrix. A dot lattice is the product of two
+    perpendicular line grids, so its coefficients are the outer product of the
+    line coefficients; the inverted lattice 1 - dots has DC 1 - tau^2 and all
+    other coefficients negated.
+    """
+    line = line_fourier_coefficients(np.arange(-n_harmonics, n_harmonics + 1), thickness)
+    if 'Dot' in pattern_type:
+        table = np.outer(line, line)
+        if 'Inverted' in pattern_type:
+            table = -table
+            table[n_harmonics, n_harmonics] = 1 - line[n_harmonics]**2
+    else:
+        table = line
+    table.flags.writeable = False
+    return table
+
+def fourier_coefficient_table(n_harmonics: int, thicknesses: List[float],
+                              pattern_type: str = 'Grid') -> np.ndarray:
+    """
+    Fourier coefficients of every harmonic for every layer of a pattern type.
+
+    Args:
+        n_harmonics: The highest harmonic number
+        thicknesses: The thickness of each layer
+        pattern_type: 'Grid', 'Circle', 'Dot' or 'InvertedDot'
+
+    Returns:
+        np.ndarray: Shape (2n+1, layers) for line grids and (2n+1, 2n+1, layers)
+        for dot lattices, harmonic -n at index 0
+    """
+    tables = [_layer_fourier_coefficients(n_harmonics, float(thickness), pattern_type)
+              for thickness in thicknesses]
+    if not tables:
+        return np.empty((2 * n_harmonics + 1,) * (2 if 'Dot' in pattern_type else 1) + (0,))
+    return np.stack(tables, axis=-1)
 
 def calculate_fourier_coefficient(harmonic: int, thickness: float, inverted: bool = False) -> float:
     """
@@ -35,43 +75,37 @@ def calculate_fourier_coefficient(harmonic: int, thickness: float, inverted: boo
     Returns:
         float: The magnitude of the Fourier coefficient
     """
-    tau_T = 1-thickness
-    
+    coefficient = float(line_fourier_coefficients(harmonic, thickness))
     if inverted:
-        # For inverted patterns, we need to flip the DC component and negate other harmonics
-        if harmonic == 0:
-            return 1 - tau_T  # Inverted DC component
-        else:
-            # For non-zero harmonics, phase is shifted by π
-            return -np.abs((1.0 / (np.pi * harmonic)) * np.sin(harmonic * np.pi * tau_T))
-    else:
-        # Original coefficient calculation
-        if harmonic == 0:
-            return tau_T
-        return np.abs((1.0 / (np.pi * harmonic)) * np.sin(harmonic * np.pi * tau_T))
+        # Flip the DC component, the other harmonics are phase shifted by π
+        return 1 - coefficient if harmonic == 0 else -coefficient
+    return coefficient
 
-def create_frequency_vectors(pattern_type: str, frequencies: List[float], 
+def create_frequency_vectors(pattern_type: Union[str, List[str]], frequencies: List[float], 
                            angles: List[float], thicknesses: List[float]) -> List[Dict]:
     """
     Create base frequency vectors with proper Fourier coefficients.
+
+    pattern_type is either the type of every layer or a list with one type per layer.
     """
     vectors = []
-    is_inverted = 'Inverted' in pattern_type
+    pattern_types = [pattern_type] * len(frequencies) if isinstance(pattern_type, str) else pattern_type
     
-    for i, (f, theta, thickness) in enumerate(zip(frequencies, angles, thicknesses)):
+    for i, (layer_type, f, theta, thickness) in enumerate(zip(pattern_types, frequencies, angles, thicknesses)):
+        is_inverted = 'Inverted' in layer_type
         x = f * np.cos(np.radians(theta))
         y = f * np.sin(np.radians(theta))
         base_vector = np.array([x, y])
         
-        if 'Dot' in pattern_type:
+        if 'Dot' in layer_type:
             perp_vector = np.array([-y, x])
-            base_intensity = calculate_fourier_coefficient(1, thickness, is_inverted)
+            base_intensity = float(fourier_coefficient_table(1, [thickness], layer_type)[2, 1, 0])
             
             vectors.append({
                 'vector': base_vector,
                 'index': i,
                 'intensity': base_intensity,
-                'pattern_type': pattern_type,
+                'pattern_type': layer_type,
                 'direction': 'horizontal',
                 'base_vector': True,
                 'thickness': thickness,
@@ -81,19 +115,19 @@ def create_frequency_vectors(pattern_type: str, frequencies: List[float],
                 'vector': perp_vector,
                 'index': i,
                 'intensity': base_intensity,
-                'pattern_type': pattern_type,
+                'pattern_type': layer_type,
                 'direction': 'vertical',
                 'base_vector': True,
                 'thickness': thickness,
                 'inverted': is_inverted
             })
         else:
-            base_intensity = calculate_fourier_coefficient(1, thickness, is_inverted)
+            base_intensity = float(fourier_coefficient_table(1, [thickness], layer_type)[2, 0])
             vectors.append({
                 'vector': base_vector,
                 'index': i,
                 'intensity': base_intensity,
-                'pattern_type': pattern_type,
+                'pattern_type': layer_type,
                 'direction': None,
                 'base_vector': True,
                 'thickness': thickness,
@@ -101,58 +135,142 @@ def create_frequency_vectors(pattern_type: str, frequencies: List[float],
             })
     return vectors
 
+def _group_layers(base_vectors: List[Dict]) -> List[List[Dict]]:
+    """Group the base vectors of each layer (one for a line grid, two for a dot lattice)."""
+    layers = []
+    for base_vector in base_vectors:
+        if layers and layers[-1][0]['index'] == base_vector['index']:
+            layers[-1].append(base_vector)
+        else:
+            layers.append([base_vector])
+    return layers
+
 def zero_harmonic_Intensity(base_vectors: List[Dict]) -> float:
     zero_harmonic_I = 1.0
-    for base_vector in base_vectors:
-        zero_harmonic_I *= calculate_fourier_coefficient(0, base_vector['thickness'], 
-                                                       base_vector.get('inverted', False))
+    for layer in _group_layers(base_vectors):
+        table = fourier_coefficient_table(0, [layer[0]['thickness']], layer[0]['pattern_type'])
+        zero_harmonic_I *= abs(float(table.flat[0]))
     return zero_harmonic_I
 
+def _layer_ratio_tables(base_vectors: List[Dict], nHarmonics: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Intensity ratio to the DC component and harmonics of every entry of each layer table."""
+    harmonic_range = np.arange(-nHarmonics, nHarmonics + 1)
+    layer_ratios = []
+    layer_harmonics = []
+    for layer in _group_layers(base_vectors):
+        table = np.abs(fourier_coefficient_table(nHarmonics, [layer[0]['thickness']],
+                                                 layer[0]['pattern_type'])[..., 0])
+        layer_ratios.append(table.ravel() / table[(nHarmonics,) * table.ndim])
+        grids = np.meshgrid(*[harmonic_range] * table.ndim, indexing='ij')
+        layer_harmonics.append(np.stack([grid.ravel() for grid in grids], axis=1))
+    return layer_ratios, layer_harmonics
+
+def _pruned_expansion(layer_ratios: List[np.ndarray], intensity_ratio_threshold: float,
+                      chunk_size: int = 1 << 16) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Expand the combinations layer by layer, keeping those that can still reach the threshold.
+
+    Every coefficient is at most the DC coefficient of its layer, so a layer
+    entry is dropped when it misses the threshold with the best ratio of all
+    the other layers, and a partial combination when it misses it with the
+    best ratio of the remaining layers. Products are formed for chunk_size
+    partial combinations at a time, so only the kept ones are held.
+
+    Yields:
+        For each layer, the ratios of the kept partial combinations and, for
+        each of them, its parent in the previous layer and its entry in this layer
+    """
+    best = [ratios.max() for ratios in layer_ratios]
+    best_before = np.cumprod([1.0] + best)[:-1]
+    best_after = np.cumprod([1.0] + best[::-1])[::-1][1:]
+
+    ratios = np.ones(1)
+    for layer_ratio, before, after in zip(layer_ratios, best_before, best_after):
+        entries = np.flatnonzero(layer_ratio * before * after >= intensity_ratio_threshold)
+        entry_ratios = layer_ratio[entries]
+        rows = max(1, chunk_size // max(len(entries), 1))
+        kept_ratios, kept_parents, kept_entries = [], [], []
+        for start in range(0, len(ratios), rows):
+            products = ratios[start:start + rows, None] * entry_ratios[None, :]
+            parents, columns = np.nonzero(products * after >= intensity_ratio_threshold)
+            kept_ratios.append(products[parents, columns])
+            kept_parents.append(parents + start)
+            kept_entries.append(entries[columns])
+        ratios = np.concatenate(kept_ratios) if kept_ratios else np.empty(0)
+        yield (ratios,
+               np.concatenate(kept_parents) if kept_parents else np.empty(0, dtype=int),
+               np.concatenate(kept_entries) if kept_entries else np.empty(0, dtype=int))
+
+def vector_count_bound(base_vectors: List[Dict], nHarmonics: int,
+                       intensity_ratio_threshold: float, max_partial: int = 1 << 20) -> Tuple[int, int]:
+    """
+    Number of vectors create_all_vectors returns and number of partial combinations it holds.
+
+    Runs the same pruned layer by layer expansion, only counting. If a partial
+    expansion grows beyond max_partial combinations, the count of the remaining
+    layers is bounded by the product of their entries that can reach the
+    threshold, and upper bounds are returned instead.
+
+    Returns:
+        Tuple[int, int]: The vector count and the partial combinations of all
+        layers, which create_all_vectors keeps until the last layer
+    """
+    if not base_vectors:
+        return 0, 0
+    layer_ratios, _ = _layer_ratio_tables(base_vectors, nHarmonics)
+    best = [ratios.max() for ratios in layer_ratios]
+    count, partial = 1, 0
+    for i, (ratios, _, _) in enumerate(_pruned_expansion(layer_ratios, intensity_ratio_threshold)):
+        count = len(ratios)
+        partial += count
+        if count > max_partial:
+            others = np.prod(best) / np.array(best)
+            for j in range(i + 1, len(layer_ratios)):
+                count *= int(np.count_nonzero(layer_ratios[j] * others[j] >= intensity_ratio_threshold))
+                partial += count
+            break
+    return count, partial
+
 def create_all_vectors(base_vectors: List[Dict], nHarmonics: int,
                        intensity_ratio_threshold: float) -> List[Dict]:
     """
     Create all harmonic vector combinations with correct Fourier coefficients.
+
+    Combinations are expanded layer by layer as arrays, pruning those that
+    cannot reach the threshold (see _pruned_expansion). Only the parent and
+    entry of the kept combinations are recorded, their harmonics being
+    gathered once the last layer is reached.
     """
-    all_vectors = []
-    direction_number = len(base_vectors)
-    
-    # Generate all possible combinations of harmonics
-    harmonic_range = range(-nHarmonics, nHarmonics + 1)
-    harmonic_combinations = product(harmonic_range, repeat=direction_number)
-    
-    zero_harmonic_I = zero_harmonic_Intensity(base_vectors)
-
-    for combination in harmonic_combinations:
-        vector = {
-            'vector': np.array([0.0, 0.0]),
-            'coordinates': [],
-            'intensity': 1.0,
-            'pattern_type': "",
-            'direction': None,
-            'base_vector': False
-        }
-        add_vector = True
-        # Calculate combined vector and intensity
-        for harmonic, base_vector in zip(combination, base_vectors):
-            coef = calculate_fourier_coefficient(harmonic, base_vector['thickness'])
-            vector['intensity'] *= coef
-        
-            if vector['intensity'] < intensity_ratio_threshold * zero_harmonic_I:
-                add_vector = False
-                break
-            # Add to position vector
-            vector['vector'] += harmonic * base_vector['vector']
-            vector['coordinates'].append(harmonic)
-
-            vector['pattern_type'] = base_vector['pattern_type']
-        
-        # Check if this is a base vector (only one non-zero harmonic)
-        if vector['coordinates'].count(0) == direction_number - 1:
-            vector['base_vector'] = True
-        if add_vector:    
-            all_vectors.append(vector)
-    
-    return all_vectors
+    if not base_vectors:
+        return []
+    layer_ratios, layer_harmonics = _layer_ratio_tables(base_vectors, nHarmonics)
+
+    steps = list(_pruned_expansion(layer_ratios, intensity_ratio_threshold))
+    ratios = steps[-1][0]
+
+    # Walk back from the last layer to the first one
+    rows = np.arange(len(ratios))
+    columns = []
+    for (_, parents, entries), harmonics in zip(steps[::-1], layer_harmonics[::-1]):
+        columns.append(harmonics[entries[rows]])
+        rows = parents[rows]
+    coordinates = np.concatenate(columns[::-1], axis=1)
+    del steps
+
+    positions = coordinates @ np.array([base_vector['vector'] for base_vector in base_vectors])
+    intensities = ratios * zero_harmonic_Intensity(base_vectors)
+    is_base = np.count_nonzero(coordinates, axis=1) == 1
+    pattern_type = base_vectors[-1]['pattern_type']
+
+    return [{
+        'vector': position,
+        'coordinates': combination,
+        'intensity': intensity,
+        'pattern_type': pattern_type,
+        'direction': None,
+        'base_vector': base
+    } for position, combination, intensity, base in zip(
+        positions, coordinates.tolist(), intensities.tolist(), is_base.tolist())]
 
 def is_within_visibility_disk(vector: np.ndarray, disk_radius: float) -> bool:
     return np.linalg.norm(vector) <= disk_radius
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import multiprocessing
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'main.py')
+sys.path.insert(0, os.path.dirname(APP_PATH))
+
+# Layer index of each pattern type in get_input_controls, for its default angle
+GRIDS = [('Grid', 0), ('Grid', 1), ('Grid', 2), ('Grid', 3)]
+DOTS = [('Dot', 6), ('Dot', 7), ('InvertedDot', 8)]
+
+# (name, layers, harmonics, intensity threshold), the dot-heavy ones last
+SETTINGS = [
+    ('default', GRIDS[:1], 2, 0.12),
+    ('2 grids', GRIDS[:2], 5, 0.12),
+    ('4 grids', GRIDS, 10, 0.05),
+    ('2 dots', DOTS[:2], 10, 0.05),
+    ('7 layers', GRIDS + DOTS, 5, 0.12),
+    ('7 layers', GRIDS + DOTS, 10, 0.05),
+    ('7 layers', GRIDS + DOTS, 3, 0.01),
+]
+
+def current_rss():
+    """Resident memory of the process in bytes (Linux), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def run_pipeline(layers, n_harmonics, intensity_threshold, pattern_size=700,
+                 window_half_size=100.0, visibility_radius=100.0):
+    """The computations and figures of a main() rerun in 'Pattern & Frequency' mode, at the app defaults."""
+    import plotly.io as pio
+    from utils.pattern_utils import create_pattern
+    from utils.vector_utils import create_frequency_vectors, create_all_vectors
+    from utils.fourier_utils import compute_fourier_transform, compute_inverse_fourier
+    from utils.visualization_handlers import create_pattern_figure, create_frequency_vector_figure
+
+    pattern_types = [pattern_type for pattern_type, _ in layers]
+    angles = [index * 45.0 for _, index in layers]
+    base_vectors = create_frequency_vectors(pattern_types, [40.0] * len(layers), angles, [0.5] * len(layers))
+
+    combined_pattern = np.ones((pattern_size, pattern_size))
+    for pattern_type, angle in zip(pattern_types, angles):
+        combined_pattern *= create_pattern(pattern_size, 40.0, angle, 0.5, pattern_type, (0, 0))
+    fourier_spectrum, _ = compute_fourier_transform(combined_pattern, window_half_size, visibility_radius)
+    inverse_fourier = compute_inverse_fourier(fourier_spectrum)
+    all_vectors = create_all_vectors(base_vectors, n_harmonics, intensity_threshold)
+
+    # st.plotly_chart serializes the figures to JSON
+    pio.to_json(create_pattern_figure(combined_pattern), validate=False)
+    pio.to_json(create_frequency_vector_figure(all_vectors, base_vectors, visibility_radius, window_half_size),
+                validate=False)
+    return base_vectors, len(all_vectors), inverse_fourier.shape
+
+def measure_setting(layers, n_harmonics, intensity_threshold, results):
+    """Run one setting in this process and put the estimate and the measured peak on the results queue."""
+    from utils.vector_utils import create_frequency_vectors
+    from utils.memory_governor import plan_rerun
+
+    # Warm up the imports and caches on a small rerun
+    run_pipeline(GRIDS[:1], 1, 0.5, pattern_size=64)
+
+    pattern_types = [pattern_type for pattern_type, _ in layers]
+    base_vectors = create_frequency_vectors(pattern_types, [40.0] * len(layers),
+                                            [index * 45.0 for _, index in layers], [0.5] * len(layers))
+    started = time.perf_counter()
+    plan = plan_rerun(700, len(layers), base_vectors, n_harmonics, intensity_threshold, 100.0,
+                      memory_budget=float('inf'), time_budget=float('inf'))
+    planning_seconds = time.perf_counter() - started
+
+    rss_samples = []
+    done = threading.Event()
+    def sample_rss():
+        while not done.is_set():
+            rss_samples.append(current_rss() or 0)
+            time.sleep(0.002)
+
+    rss_before = current_rss() or 0
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    _, vector_count, _ = run_pipeline(layers, n_harmonics, intensity_threshold)
+    seconds = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    results.put({
+        'vectors': vector_count,
+        'estimated_mb': plan['peak_bytes'] / 2**20,
+        'measured_mb': (max(rss_samples, default=rss_before) - rss_before) / 2**20,
+        'estimated_s': plan['seconds'],
+        'measured_s': seconds,
+        'planning_s': planning_seconds
+    })
+
+def check(settings):
+    """Measure every setting in a fresh process. Returns the rows of the report."""
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for name, layers, n_harmonics, intensity_threshold in settings:
+        results = context.Queue()
+        process = context.Process(target=measure_setting, args=(layers, n_harmonics, intensity_threshold, results))
+        process.start()
+        result = results.get()
+        process.join()
+        rows.append(dict(result, setting=f"{name}, n={n_harmonics}, t={intensity_threshold}"))
+    return rows
+
+# Usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the rerun cost estimated by utils/memory_governor.py with measured peaks.")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="Fail when a measured peak exceeds tolerance times the estimate")
+    args = parser.parse_args()
+
+    rows = check(SETTINGS)
+    columns = ['vectors', 'estimated_mb', 'measured_mb', 'estimated_s', 'measured_s', 'planning_s']
+    print(f"{'setting':<32}" + ''.join(f"{column:>14}" for column in columns))
+    for row in rows:
+        print(f"{row['setting']:<32}" + ''.join(f"{row[column]:>14.2f}" if isinstance(row[column], float)
+                                                else f"{row[column]:>14}" for column in columns))
+
+    under = [row['setting'] for row in rows if row['measured_mb'] > args.tolerance * row['estimated_mb']]
+    slow = [row['setting'] for row in rows if row['measured_s'] > args.tolerance * row['estimated_s']]
+    if slow:
+        print(f"Duration underestimated (machine dependent) for: {', '.join(slow)}")
+    if under:
+        print(f"Peak memory underestimated for: {', '.join(under)}")
+        sys.exit(1)
+    print("All measured peaks within the estimates")
@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'main.py')
+sys.path.insert(0, os.path.dirname(APP_PATH))
+from utils.compute_scheduler import get_scheduler
+
+# Sliders a user drags, with the range and step of get_input_controls
+DRAG_SLIDERS = {
+    'frequency_0': (10.0, 100.0, 0.1),
+    'angle_0': (0.0, 360.0, 1.0),
+    'thickness_0': (0.1, 0.9, 0.1),
+    'frequency_1': (10.0, 100.0, 0.1),
+    'angle_1': (0.0, 360.0, 1.0),
+    'Number of Harmonics': (1, 10, 1),
+}
+TOGGLED_CHECKBOXES = ['Grid C', 'Dot Grid A']
+BARRIER_TIMEOUT = 300  # seconds to wait for all the sessions to be loaded
+RERUN_TIMEOUT = 120    # seconds to wait for a rerun to finish
+SERVER_TIMEOUT = 60    # seconds to wait for the server to start
+
+def make_drag_trace(n_steps, rng):
+    """
+    Build a sequence of widget changes looking like a user exploring the app.
+
+    The user first adds Grid B to get a moiré, then moves sliders in short
+    drags of a few small steps in one direction, and switches other layers
+    on or off from time to time.
+    """
+    trace = [('checkbox', 'Grid B', None)]
+    values = {}
+    while len(trace) < n_steps:
+        if rng.random() < 0.1:
+            trace.append(('checkbox', str(rng.choice(TOGGLED_CHECKBOXES)), None))
+            continue
+        name = str(rng.choice(list(DRAG_SLIDERS)))
+        low, high, step = DRAG_SLIDERS[name]
+        value = values.get(name, rng.uniform(low, high))
+        direction = rng.choice([-1, 1])
+        for _ in range(rng.integers(2, 6)):
+            value = float(np.clip(value + direction * step * rng.integers(1, 10), low, high))
+            value = round(round(value / step) * step, 1)
+            trace.append(('slider', name, int(value) if isinstance(step, int) else value))
+        values[name] = value
+    return trace[:n_steps]
+
+class AppClient:
+    """
+    Minimal Streamlit browser: sends reruns with the widget states and reads the script output.
+
+    Widgets are tracked by id as the frontend does, and looked up by key or,
+    for widgets without key, by label. Radio buttons and buttons are never
+    changed and are left to their defaults.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.widgets = {}   # key or label -> (kind, id)
+        self.states = {}    # id -> WidgetState sent with every rerun
+        self.cached = {}    # message hash -> element type, for messages the server sends by reference
+        self.degraded = False
+
+    def _track_widget(self, kind, widget):
+        key = widget.id.split('-', 2)[-1]
+        self.widgets[widget.label] = self.widgets[key if key != 'None' else widget.label] = (kind, widget.id)
+        if widget.id in self.states:
+            return
+        state = WidgetState(id=widget.id)
+        if kind == 'slider':
+            state.double_array_value.data[:] = widget.value if widget.set_value else widget.default
+        elif kind == 'checkbox':
+            state.bool_value = widget.value if widget.set_value else widget.default
+        elif kind == 'number_input':
+            state.double_value = widget.value if widget.set_value else widget.default
+        else:
+            return
+        self.states[widget.id] = state
+
+    async def rerun(self):
+        """
+        Rerun the script with the current widget states.
+
+        Returns:
+            str or None: The error of the run, None when it ran to the end and drew its charts.
+            degraded tells whether the memory governor lowered the quality of the run.
+        """
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self.websocket.send(message.SerializeToString())
+
+        self.widgets = {}
+        self.degraded = False
+        elements, error = [], None
+        while True:
+            forward = ForwardMsg.FromString(await asyncio.wait_for(self.websocket.recv(), RERUN_TIMEOUT))
+            kind = forward.WhichOneof('type')
+            if kind == 'ref_hash':
+                elements.append(self.cached.get(forward.ref_hash))
+            elif kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                elements.append(element_type)
+                if forward.hash:
+                    self.cached[forward.hash] = element_type
+                if element_type in ('slider', 'checkbox', 'number_input'):
+                    self._track_widget(element_type, getattr(element, element_type))
+                elif element_type == 'exception' and error is None:
+                    error = element.exception.message or element.exception.type
+                elif element_type == 'alert' and element.alert.body.startswith("Quality lowered"):
+                    self.degraded = True
+            elif kind == 'script_finished':
+                if forward.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY and error is None:
+                    status = ForwardMsg.ScriptFinishedStatus.Name(forward.script_finished)
+                    error = f"script finished with status {status}"
+                break
+        if error is None and 'plotly_chart' not in elements:
+            error = "rerun produced no script result"
+        return error
+
+    def apply(self, action):
+        """Change the widget of one trace entry. Returns False if the widget is not shown."""
+        kind, name, value = action
+        if self.widgets.get(name, (None,))[0] != kind:
+            return False
+        state = self.states[self.widgets[name][1]]
+        if kind == 'slider':
+            state.double_array_value.data[:] = [value]
+        else:
+            state.bool_value = not state.bool_value
+        return True
+
+async def run_session(url, trace, think_time, start_barrier, result):
+    """Replay a trace over one websocket connection, filling result."""
+    try:
+        async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as websocket:
+            client = AppClient(websocket)
+            try:
+                error = await client.rerun()
+                if error:
+                    raise RuntimeError(f"initial run failed: {error}")
+            except Exception:
+                await start_barrier.abort()
+                raise
+            try:
+                await asyncio.wait_for(start_barrier.wait(), BARRIER_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.BrokenBarrierError):
+                result['errors'].append("another session failed to start")
+                return
+
+            for action in trace:
+                if not client.apply(action):
+                    result['skipped'] += 1
+                    continue
+                started = time.perf_counter()
+                error = await client.rerun()
+                result['latencies'].append(time.perf_counter() - started)
+                result['applied'] += 1
+                result['degraded'] += client.degraded
+                if error:
+                    result['errors'].append(error)
+                await asyncio.sleep(think_time)
+    except Exception as e:
+        result['errors'].append(f"{type(e).__name__}: {e}")
+
+def serve(port, metrics_path):
+    """
+    Run app/main.py with `streamlit run` in this process.
+
+    A thread copies the metrics of the compute scheduler shared by all the
+    sessions of the server to metrics_path.
+    """
+    def publish_metrics():
+        while True:
+            tmp_path = metrics_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(get_scheduler().metrics(), f)
+            os.replace(tmp_path, metrics_path)
+            time.sleep(0.1)
+    threading.Thread(target=publish_metrics, daemon=True).start()
+
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', APP_PATH, '--server.headless=true', f'--server.port={port}',
+                '--server.fileWatcherType=none', '--browser.gatherUsageStats=false']
+    cli.main()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+def process_usage(pid):
+    """CPU seconds and resident bytes of a process (Linux)."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f'/proc/{pid}/statm') as f:
+        rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    return cpu, rss
+
+def start_server(metrics_path):
+    """Start the server in a child process and wait until it answers."""
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port),
+                               '--metrics', metrics_path],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVER_TIMEOUT
+    while True:
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server, f'ws://localhost:{port}/_stcore/stream'
+        except OSError:
+            pass
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError(f"Streamlit server did not start (exit code {server.poll()})")
+        time.sleep(0.2)
+
+async def drive_sessions(url, traces, think_time, pid):
+    """Run the sessions concurrently, sampling the server. Returns session results, samples and wall time."""
+    results = [{'latencies': [], 'errors': [], 'applied': 0, 'skipped': 0, 'degraded': 0} for _ in traces]
+    start_barrier = asyncio.Barrier(len(traces) + 1)
+    tasks = [asyncio.create_task(run_session(url, trace, think_time, start_barrier, result))
+             for trace, result in zip(traces, results)]
+    try:
+        await asyncio.wait_for(start_barrier.wait(), BARRIER_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.BrokenBarrierError):
+        await start_barrier.abort()
+
+    samples = []
+    started = time.perf_counter()
+    sessions = asyncio.gather(*tasks)
+    while not sessions.done():
+        samples.append(process_usage(pid))
+        await asyncio.wait([sessions], timeout=0.05)
+    wall = time.perf_counter() - started
+    samples.append(process_usage(pid))
+    return results, samples, wall
+
+def measure(n_sessions, n_steps, think_time, seed):
+    """Replay one trace per session against one server and collect latency and server resource figures."""
+    rng = np.random.default_rng(seed)
+    traces = [make_drag_trace(n_steps, rng) for _ in range(n_sessions)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        metrics_path = os.path.join(directory, 'metrics.json')
+        server, url = start_server(metrics_path)
+        try:
+            # One session loads the app modules before the baseline is taken
+            asyncio.run(drive_sessions(url, [[]], 0, server.pid))
+            cpu_before, rss_before = process_usage(server.pid)
+            results, samples, wall = asyncio.run(drive_sessions(url, traces, think_time, server.pid))
+            time.sleep(0.2)
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                metrics = json.load(f)
+        finally:
+            server.terminate()
+            server.wait()
+
+    errors = [error for result in results for error in result['errors']]
+    latencies_ms = np.array([latency for result in results for latency in result['latencies']]) * 1000
+    percentiles = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else [np.nan] * 3
+    peak_rss = max(rss for _, rss in samples)
+    return {
+        'sessions': n_sessions,
+        'expected_actions': n_sessions * n_steps,
+        'applied_actions': sum(result['applied'] for result in results),
+        'skipped_actions': sum(result['skipped'] for result in results),
+        'reruns': len(latencies_ms),
+        'degraded_reruns': sum(result['degraded'] for result in results),
+        'errors': len(errors),
+        'p50_ms': float(percentiles[0]),
+        'p95_ms': float(percentiles[1]),
+        'p99_ms': float(percentiles[2]),
+        'throughput_per_s': len(latencies_ms) / wall,
+        'cpu_cores': (samples[-1][0] - cpu_before) / wall,
+        'peak_rss_mb': peak_rss / 2**20,
+        'rss_per_session_mb': (peak_rss - rss_before) / 2**20 / n_sessions,
+        'max_queue_depth': metrics['max_queue_depth'],
+        'mean_wait_ms': metrics['mean_wait_seconds'] * 1000,
+        'first_error': errors[0] if errors else None
+    }
+
+def print_report(results):
+    columns = ['sessions', 'expected_actions', 'applied_actions', 'skipped_actions', 'reruns',
+               'degraded_reruns', 'errors',
+               'p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'cpu_cores', 'peak_rss_mb',
+               'rss_per_session_mb', 'max_queue_depth', 'mean_wait_ms']
+    print(' '.join(f"{column:>18}" for column in columns))
+    for result in results:
+        print(' '.join(f"{result[column]:>18.1f}" if isinstance(result[column], float)
+                       else f"{result[column]:>18}" for column in columns))
+
+# Usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure rerun latency of one app/main.py server under concurrent websocket sessions.")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Session counts to measure")
+    parser.add_argument('--steps', type=int, default=30, help="Widget changes per session")
+    parser.add_argument('--think-time', type=float, default=0.1, help="Seconds between two changes of a session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--metrics', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.metrics)
+        sys.exit()
+
+    results = []
+    for n_sessions in args.sessions:
+        print(f"Measuring {n_sessions} sessions...", flush=True)
+        results.append(measure(n_sessions, args.steps, args.think_time, args.seed))
+        result = results[-1]
+        if result['first_error']:
+            print(f"  {result['errors']} errors, first: {result['first_error']}")
+        if result['applied_actions'] + result['skipped_actions'] != result['expected_actions'] \
+                or result['skipped_actions']:
+            print(f"  {result['expected_actions']} actions expected, {result['applied_actions']} applied, "
+                  f"{result['skipped_actions']} skipped")
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to: {args.output}")
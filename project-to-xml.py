@@ -1,50 +1,198 @@
 import os
+import json
+import codecs
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-def create_xml_from_project(project_path):
-    """Convert a project directory into the required XML format."""
-    xml_parts = ['<documents>']
-    index = 1
-    
-    for root, _, files in os.walk(project_path):
+SKIP_DIRS = {'.git', '__pycache__'}
+SKIP = ['.git', '__pycache__', '.pyc', '.env']
+SNIFF_SIZE = 8192          # bytes read to tell text from binary
+LARGE_FILE_SIZE = 1 << 20  # larger files are streamed by the writer instead of loaded by a worker
+CHUNK_SIZE = 1 << 16
+
+def iter_project_files(project_path, excluded):
+    """Yield (relative path, path, stat) of the files to dump."""
+    for root, dirs, files in os.walk(project_path):
+        # Skip common files/directories you might want to exclude
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
         for file in files:
-            # Skip common files/directories you might want to exclude
-            if any(skip in file for skip in ['.git', '__pycache__', '.pyc', '.env']):
+            if any(skip in file for skip in SKIP):
                 continue
-                
             file_path = os.path.join(root, file)
+            if os.path.abspath(file_path) in excluded:
+                continue
+            yield os.path.relpath(file_path, project_path), file_path, os.stat(file_path)
+
+def is_binary(file_path):
+    """Sniff the start of a file: NUL bytes or invalid UTF-8 mean binary."""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+    if b'\0' in head:
+        return True
+    try:
+        # Not final: the sniffed block may end inside a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+def read_file(file_path, size):
+    """Worker: sniff a file and read it when small. Returns (kind, content)."""
+    try:
+        if is_binary(file_path):
+            return 'binary', None
+        if size > LARGE_FILE_SIZE:
+            return 'large', None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return 'text', f.read()
+    except UnicodeDecodeError:
+        return 'binary', None
+    except Exception as e:
+        return 'error', e
+
+def load_manifest(manifest_path, output_path):
+    """Entries of the previous dump, if the dump is still the one the manifest describes."""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if os.path.getsize(output_path) != manifest['dump_size']:
+            return {}
+        return manifest['files']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def write_xml_from_project(project_path, output_path, max_workers=8):
+    """
+    Write a project directory to output_path in the required XML format.
+
+    Files are streamed to the output as they are read by a pool of workers,
+    at most a few files being held in memory. A manifest next to the output
+    records the mtime, size, hash and position of every file, so the next run
+    copies unchanged files from the previous dump instead of reading them. A
+    copied range whose hash no longer matches is dropped and the file read.
+
+    Returns:
+        dict: Number of files 'written', 'reused' and 'skipped'
+    """
+    manifest_path = output_path + '.manifest.json'
+    tmp_path = output_path + '.tmp'
+    previous = load_manifest(manifest_path, output_path)
+    excluded = {os.path.abspath(path) for path in (output_path, manifest_path, tmp_path)}
+    files = {}
+    counts = {'written': 0, 'reused': 0, 'skipped': 0}
+
+    def is_unchanged(relative_path, stat):
+        entry = previous.get(relative_path)
+        return entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+
+    with open(tmp_path, 'wb') as out, \
+            open(output_path, 'rb') if previous else open(os.devnull, 'rb') as old_dump, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def write_text(text):
+            out.write(text.replace('\n', os.linesep).encode('utf-8'))
+
+        def write_document(relative_path, file_path, stat, result):
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+            if result is None:
+                # Unchanged: copy the content from the previous dump
+                entry = previous[relative_path]
+                if entry.get('binary'):
+                    files[relative_path] = entry
+                    counts['skipped'] += 1
+                    return
+            elif result[0] == 'binary':
+                print(f"Skipping binary file: {file_path}")
+                files[relative_path] = dict(entry, binary=True)
+                counts['skipped'] += 1
+                return
+            elif result[0] == 'error':
+                print(f"Error processing {file_path}: {result[1]}")
+                counts['skipped'] += 1
+                return
+
+            start = out.tell()
+            index = counts['written'] + counts['reused'] + 1
+            write_text(f'\n<document index="{index}">\n<source>{relative_path}</source>\n'
+                       f'<document_content>\n')
+            content_start = out.tell()
+            digest = hashlib.sha256()
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Create relative path from project root
-                relative_path = os.path.relpath(file_path, project_path)
-                
-                xml_parts.append(f'<document index="{index}">')
-                xml_parts.append(f'<source>{relative_path}</source>')
-                xml_parts.append('<document_content>')
-                xml_parts.append(content)
-                xml_parts.append('</document_content>')
-                xml_parts.append('</document>')
-                
-                index += 1
+                if result is None:
+                    old_dump.seek(entry['offset'])
+                    remaining = entry['length']
+                    while remaining:
+                        block = old_dump.read(min(CHUNK_SIZE, remaining))
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+                        remaining -= len(block)
+                    if remaining or digest.hexdigest() != entry.get('sha256'):
+                        # The previous dump was altered: read the file instead
+                        out.seek(start)
+                        out.truncate()
+                        write_document(relative_path, file_path, stat, read_file(file_path, stat.st_size))
+                        return
+                elif result[0] == 'text':
+                    data = result[1].replace('\n', os.linesep).encode('utf-8')
+                    digest.update(data)
+                    out.write(data)
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        for block in iter(lambda: f.read(CHUNK_SIZE), ''):
+                            data = block.replace('\n', os.linesep).encode('utf-8')
+                            digest.update(data)
+                            out.write(data)
             except UnicodeDecodeError:
+                # Binary data after the sniffed block: drop the partial document
+                out.seek(start)
+                out.truncate()
                 print(f"Skipping binary file: {file_path}")
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-    
-    xml_parts.append('</documents>')
-    return '\n'.join(xml_parts)
+                files[relative_path] = dict(entry, binary=True)
+                counts['skipped'] += 1
+                return
+
+            files[relative_path] = dict(entry, offset=content_start, length=out.tell() - content_start,
+                                        sha256=digest.hexdigest())
+            write_text('\n</document_content>\n</document>')
+            counts['reused' if result is None else 'written'] += 1
+
+        write_text('<documents>')
+        # Keep a bounded window of files in flight, written in walk order
+        pending = deque()
+        for relative_path, file_path, stat in iter_project_files(project_path, excluded):
+            if is_unchanged(relative_path, stat):
+                future = None
+            else:
+                future = executor.submit(read_file, file_path, stat.st_size)
+            pending.append((relative_path, file_path, stat, future))
+            while len(pending) > 2 * max_workers:
+                relative_path, file_path, stat, future = pending.popleft()
+                write_document(relative_path, file_path, stat, future and future.result())
+        while pending:
+            relative_path, file_path, stat, future = pending.popleft()
+            write_document(relative_path, file_path, stat, future and future.result())
+        write_text('\n</documents>')
+
+    os.replace(tmp_path, output_path)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'dump_size': os.path.getsize(output_path), 'files': files}, f)
+    return counts
 
 # Usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dump a project directory to XML.")
     # project_path = input("Enter the path to your project directory: ")
-    project_path = "C:/Users/enzo/Documents/01_Enzo/04_Moire/Codes_Moire/Moire_streamlit_app"
-    output_path = "project_dump.xml"
-    
-    xml_content = create_xml_from_project(project_path)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(xml_content)
-        
-    print(f"XML dump created at: {output_path}")
+    parser.add_argument('project_path', nargs='?',
+                        default="C:/Users/enzo/Documents/01_Enzo/04_Moire/Codes_Moire/Moire_streamlit_app")
+    parser.add_argument('--output', default="project_dump.xml")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    counts = write_xml_from_project(args.project_path, args.output, args.workers)
 
+    print(f"XML dump created at: {args.output} "
+          f"({counts['written']} read, {counts['reused']} reused, {counts['skipped']} skipped)")